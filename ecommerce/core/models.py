@@ -1,4 +1,5 @@
 import logging
+from http.cookiejar import DefaultCookiePolicy
 from urllib.parse import urljoin, urlsplit
 
 import waffle
@@ -385,19 +386,25 @@ class SiteConfiguration(models.Model):
             return urlsplit(self.payment_microfrontend_url).netloc
         return self.site.domain
 
-    @property
+    @cached_property
     def oauth_api_client(self):
         """
         This client is authenticated with the configured oauth settings and automatically cached.
 
+        The access token is cached in the Django cache by edx-rest-api-client either way; the client
+        is memoized on the configuration so its connection pool is reused. Since the same session then
+        serves unrelated calls for as long as the configuration is cached, it does not keep cookies.
+
         Returns:
             requests.Session: API client
         """
-        return OAuthAPIClient(
+        client = OAuthAPIClient(
             settings.BACKEND_SERVICE_EDX_OAUTH2_PROVIDER_URL,
             settings.BACKEND_SERVICE_EDX_OAUTH2_KEY,
             settings.BACKEND_SERVICE_EDX_OAUTH2_SECRET,
         )
+        client.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        return client
 
     @cached_property
     def embargo_api_url(self):
@@ -377,6 +377,25 @@ class SiteConfigurationTests(TestCase):
         self.assertEqual(client.get_jwt_access_token(), token)
         self.assertEqual(len(responses.calls), 1)
 
+        self.assertIs(site_config.oauth_api_client, client)
+        self.assertEqual(client.get_jwt_access_token(), token)
+        self.assertEqual(len(responses.calls), 1)
+
+    @responses.activate
+    def test_oauth_api_client_ignores_cookies(self):
+        """
+        Verify the memoized client does not carry cookies from one response into later requests.
+        """
+        self.mock_access_token_response()
+        site_config = SiteConfigurationFactory()
+        url = site_config.build_lms_url('/api/user/v1/accounts')
+        responses.add(responses.GET, url, json={}, headers={'Set-Cookie': 'sessionid=abc123; Path=/'})
+
+        client = site_config.oauth_api_client
+        client.get(url)
+
+        self.assertEqual(len(client.cookies), 0)
+
 
 class EcommerceFeatureRoleTests(TestCase):
     def test_str(self):
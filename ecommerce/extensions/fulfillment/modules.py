@@ -194,7 +194,6 @@ class EnrollmentFulfillmentModule(EnterpriseDiscountMixin, BaseFulfillmentModule
         enrollment_api_url = get_lms_enrollment_api_url()
         timeout = settings.ENROLLMENT_FULFILLMENT_TIMEOUT
         headers = {
-            'Content-Type': 'application/json',
             'X-Edx-Api-Key': settings.EDX_API_KEY
         }
 
@@ -206,7 +205,7 @@ class EnrollmentFulfillmentModule(EnterpriseDiscountMixin, BaseFulfillmentModule
         if ip:
             headers['X-Forwarded-For'] = ip
 
-        return requests.post(enrollment_api_url, data=json.dumps(data), headers=headers, timeout=timeout)
+        return requests.post(enrollment_api_url, json=data, headers=headers, timeout=timeout)
 
     def _add_enterprise_data_to_enrollment_api_post(self, data, order):
         """ Augment enrollment api POST data with enterprise specific data.
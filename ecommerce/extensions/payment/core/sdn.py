@@ -13,7 +13,9 @@ import requests
 from django.conf import settings
 from django.contrib.auth import logout
 from oscar.core.loading import get_model
+from requests.adapters import HTTPAdapter
 from requests.exceptions import HTTPError, Timeout
+from urllib3.util.retry import Retry
 
 from ecommerce.extensions.payment.exceptions import SDNFallbackDataEmptyError
 from ecommerce.extensions.payment.models import SDNCheckFailure, SDNFallbackData, SDNFallbackMetadata
@@ -26,16 +28,19 @@ BasketAttributeType = get_model('basket', 'BasketAttributeType')
 COUNTRY_CODES = {country.alpha_2 for country in pycountry.countries}
 
 
-def checkSDN(request, name, city, country):
+def checkSDN(request, name, city, country, basket=None):
     """
     Performs an SDN check and returns hits of the user failures.
+
+    Callers that already hold the user's basket can pass it in to skip looking it up again.
     """
     hit_count = 0
 
     site_configuration = request.site.siteconfiguration
-    basket = Basket.get_basket(request.user, site_configuration.site)
 
     if site_configuration.enable_sdn_check:
+        if basket is None:
+            basket = Basket.get_basket(request.user, site_configuration.site)
         sdn_check = SDNClient(
             api_url=settings.SDN_CHECK_API_URL,
             api_key=settings.SDN_CHECK_API_KEY,
@@ -49,7 +54,7 @@ def checkSDN(request, name, city, country):
             # the user will be blocked from making a purchase.
             logger.info(
                 'SDNCheck: SDN API call received an error: %s. SDNFallback function called for basket %d.',
-                str(e),
+                e,
                 basket.id
             )
             sdn_fallback_hit_count = checkSDNFallback(
@@ -89,22 +94,50 @@ def checkSDNFallback(name, city, country):
         4. If a subset of words match, it still counts as a match
         5. Capitalization doesn’t matter
     """
-    hit_count = 0
     records = SDNFallbackData.get_current_records_and_filter_by_source_and_type(
         'Specially Designated Nationals (SDN) - Treasury Department', 'Individual'
     )
-    records = records.filter(countries__contains=country)
+    # Only the two compared columns are needed; stream them rather than building a model
+    # instance for every record in the country.
+    records = records.filter(countries__contains=country).values_list('names', 'addresses')
     processed_name, processed_city = process_text(name), process_text(city)
-    for record in records:
-        record_names, record_addresses = set(record.names.split()), set(record.addresses.split())
-        if (processed_name.issubset(record_names) and processed_city.issubset(record_addresses)):
-            hit_count = hit_count + 1
-    return hit_count
+    return sum(
+        1 for record_names, record_addresses in records.iterator()
+        if processed_name.issubset(record_names.split()) and processed_city.issubset(record_addresses.split())
+    )
+
+
+def _build_sdn_session():
+    """
+    Build a requests session whose connection pool is shared by every SDN check in the process,
+    so consecutive checkouts reuse keep-alive connections to the SDN API instead of paying a
+    new TCP + TLS handshake each time.
+    """
+    # Only gateway errors are retried. Connection and read failures are not (connect=0, read=False),
+    # so a hung API still surfaces as requests' Timeout after SDN_CHECK_REQUEST_TIMEOUT and the
+    # fallback check runs. raise_on_status is disabled so an exhausted retry hands back the last
+    # response, and search() keeps raising HTTPError for it.
+    retries = Retry(
+        total=2,
+        connect=0,
+        read=False,
+        backoff_factor=0.1,
+        status_forcelist=[502, 503, 504],
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=50, max_retries=retries)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
 
 
 class SDNClient:
     """A utility class that handles SDN related operations."""
 
+    # Shared across instances; tests may replace it with a mock.
+    session = _build_sdn_session()
+
     def __init__(self, api_url, api_key, sdn_list):
         self.api_url = api_url
         self.api_key = api_key
@@ -142,7 +175,7 @@ class SDNClient:
         auth_header = {'subscription-key': '{}'.format(self.api_key)}
 
         try:
-            response = requests.get(
+            response = self.session.get(
                 sdn_check_url,
                 headers=auth_header,
                 timeout=settings.SDN_CHECK_REQUEST_TIMEOUT
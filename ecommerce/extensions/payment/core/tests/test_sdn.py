@@ -12,6 +12,7 @@ from django.contrib.sessions.middleware import SessionMiddleware
 from django.test import RequestFactory
 from oscar.test import factories
 from requests.exceptions import HTTPError, Timeout
+from urllib3.exceptions import ReadTimeoutError
 
 from ecommerce.core.models import User
 from ecommerce.extensions.payment.core.sdn import (
@@ -110,6 +111,19 @@ class SDNCheckTests(TestCase):
         response = self.sdn_validator.search(self.name, self.city, self.country)
         self.assertEqual(response, sdn_response)
 
+    def test_sdn_check_reuses_session(self):
+        """ Verify every SDN client shares the same pooled session. """
+        other_validator = SDNClient(self.sdn_api_url, self.sdn_api_key, self.site_configuration.sdn_api_list)
+        self.assertIs(self.sdn_validator.session, other_validator.session)
+
+        with mock.patch.object(SDNClient, 'session') as mock_session:
+            mock_session.get.return_value.status_code = 200
+            mock_session.get.return_value.json.return_value = {'total': 0}
+            response = self.sdn_validator.search(self.name, self.city, self.country)
+
+        self.assertEqual(response, {'total': 0})
+        self.assertEqual(mock_session.get.call_count, 1)
+
     def test_deactivate_user(self):
         """ Verify an SDN failure is logged. """
         response = {'description': 'Bad dude.'}
@@ -504,6 +518,30 @@ Joshuafort, MD 72104, TH",,,,,,,,,,,,,,https://banks-bender.com/,Michael Anderso
                     self.assertTrue(deactivate_account_mock.called)
                     self.assertFalse(request.user.is_authenticated)
 
+    @mock.patch('ecommerce.extensions.payment.core.sdn.checkSDNFallback')
+    def test_sdn_read_timeout_sdn_fallback_called(self, sdn_fallback_mock):
+        """
+        Verify a read timeout from the SDN API is not retried by the pooled session, surfaces as a Timeout
+        and falls back to SDNFallback.
+        """
+        request = RequestFactory().post('/payment/cybersource/submit/')
+        middleware = SessionMiddleware()
+        middleware.process_request(request)
+        request.session.save()
+        site_configuration = self.site.siteconfiguration
+        site_configuration.enable_sdn_check = True
+        site_configuration.save()
+        request.site = site_configuration.site
+        request.user = self.create_user(full_name='Juan M. de la Cruz')
+        sdn_fallback_mock.return_value = 0
+
+        read_timeout = ReadTimeoutError(None, 'http://sdn-test.fake/', 'Read timed out.')
+        with mock.patch('urllib3.connectionpool.HTTPConnectionPool._make_request', side_effect=read_timeout) as conn:
+            self.assertEqual(checkSDN(request, 'Juan M. de la Cruz', 'North Kristinaport', 'SN'), 0)
+
+        self.assertEqual(conn.call_count, 1)
+        self.assertTrue(sdn_fallback_mock.called)
+
     def test_sdn_fallback_multiple_hits(self):
         """
         Verify SDNFallback can handle returning multiple hits if it finds a hit more than once.
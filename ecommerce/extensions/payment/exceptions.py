@@ -60,6 +60,10 @@ class ExcessivePaymentForOrderError(PaymentError):
     """ Raised when duplicate payment notification is detected with different transaction ID. """
 
 
+class PaymentPendingError(GatewayError):
+    """ The payment processor may still complete a payment whose outcome we could not confirm. """
+
+
 class SDNFallbackDataEmptyError(Exception):
     """ Error for when we call checkSDNFallback and the data is not yet populated.
     This data is populated by running: ./manage.py populate_sdn_fallback_data_and_metadata
@@ -15,6 +15,7 @@ from ecommerce.extensions.basket.utils import (
     get_billing_address_from_payment_intent_data
 )
 from ecommerce.extensions.payment.constants import STRIPE_CARD_TYPE_MAP
+from ecommerce.extensions.payment.exceptions import PaymentPendingError
 from ecommerce.extensions.payment.processors import (
     ApplePayMixin,
     BaseClientSidePaymentProcessor,
@@ -24,7 +25,6 @@ from ecommerce.extensions.payment.processors import (
 logger = logging.getLogger(__name__)
 
 BasketAttribute = get_model('basket', 'BasketAttribute')
-BasketAttributeType = get_model('basket', 'BasketAttributeType')
 BillingAddress = get_model('order', 'BillingAddress')
 Country = get_model('address', 'Country')
 PaymentEvent = get_model('order', 'PaymentEvent')
@@ -33,6 +33,22 @@ PaymentProcessorResponse = get_model('payment', 'PaymentProcessorResponse')
 Source = get_model('payment', 'Source')
 SourceType = get_model('payment', 'SourceType')
 
+# Settings the current stripe.default_http_client was built with.
+_http_client_settings = {}
+
+
+def _configure_http_client(timeout, proxy):
+    """
+    Point the Stripe SDK at a requests-based client with explicit timeouts.
+
+    The client owns the keep-alive connection pool, so it is only rebuilt when its settings change.
+    """
+    client_settings = {'timeout': timeout, 'proxy': proxy}
+    if stripe.default_http_client is None or client_settings != _http_client_settings:
+        stripe.default_http_client = stripe.RequestsClient(timeout=timeout, proxy=proxy)
+        _http_client_settings.clear()
+        _http_client_settings.update(client_settings)
+
 
 class Stripe(ApplePayMixin, BaseClientSidePaymentProcessor):
     NAME = 'stripe'
@@ -64,6 +80,11 @@ class Stripe(ApplePayMixin, BaseClientSidePaymentProcessor):
         self.secret_key = configuration['secret_key']
         # The webhook endpoint secret used by Stripe to secure the endpoint. Private/secret.
         self.endpoint_secret = configuration['webhook_endpoint_secret']
+        # Seconds to wait for a connection to, and a response from, Stripe. The read timeout stays at the SDK's
+        # 80s default: it also applies to confirm, and Stripe may still be charging the card when a shorter
+        # wait gives up.
+        self.connect_timeout = configuration.get('api_connect_timeout', 3.05)
+        self.read_timeout = configuration.get('api_read_timeout', 80)
 
         stripe.api_key = self.secret_key
         stripe.api_version = self.api_version
@@ -71,6 +92,7 @@ class Stripe(ApplePayMixin, BaseClientSidePaymentProcessor):
         stripe.log = self.log_level
         stripe.max_network_retries = self.max_network_retries
         stripe.proxy = self.proxy
+        _configure_http_client((self.connect_timeout, self.read_timeout), self.proxy)
 
     @property
     def cancel_url(self):
@@ -102,10 +124,49 @@ class Stripe(ApplePayMixin, BaseClientSidePaymentProcessor):
         """
         return f'basket_pi_create_v1_{basket.order_number}'
 
+    def _retrieve_reusable_payment_intent(self, basket):
+        """
+        Return the payment intent already created for the basket, or None if there is none that can still be used.
+
+        Repeated capture-context calls for a basket (page refreshes, retries) then cost a single retrieve, rather
+        than a create that fails with an IdempotencyError whenever the basket total has changed in between.
+        """
+        transaction_id = BasketAttribute.objects.filter(
+            basket=basket,
+            attribute_type__name=PAYMENT_INTENT_ID_ATTRIBUTE,
+        ).values_list('value_text', flat=True).first()
+        if not transaction_id:
+            return None
+
+        transaction_id = transaction_id.strip()
+        try:
+            payment_intent = stripe.PaymentIntent.retrieve(id=transaction_id)
+        except stripe.error.StripeError:
+            logger.exception(
+                'Could not retrieve existing Payment Intent [%s] for basket [%d].',
+                transaction_id,
+                basket.id,
+            )
+            return None
+
+        # A canceled intent can't be paid. Once its idempotency key has expired, create makes a new one.
+        if payment_intent.get('status') == 'canceled':
+            return None
+
+        logger.info(
+            'Reusing existing Payment Intent [%s] for basket [%d] and order number [%s].',
+            transaction_id,
+            basket.id,
+            basket.order_number,
+        )
+        return payment_intent
+
     def get_capture_context(self, request):
         # TODO: consider whether the basket should be passed in from MFE, not retrieved from Oscar
         basket = Basket.get_basket(request.user, request.site)
-        if not basket.lines.exists():
+        # all_lines() loads the lines with their products and stock records once and caches them on
+        # the basket, so the total computed for the payment intent below doesn't query them again.
+        if not basket.all_lines():
             logger.info(
                 'Stripe capture-context called with empty basket [%d] and order number [%s].',
                 basket.id,
@@ -117,8 +178,10 @@ class Stripe(ApplePayMixin, BaseClientSidePaymentProcessor):
                 'client_secret': '',
             }
         else:
+            stripe_response = self._retrieve_reusable_payment_intent(basket)
+
+        if stripe_response is None:
             try:
-                logger.info("*** GETTING STRIPE RESPONSE ***")
                 stripe_response = stripe.PaymentIntent.create(
                     **self._build_payment_intent_parameters(basket),
                     # This means this payment intent can only be confirmed with secret key (as in, from ecommerce)
@@ -126,9 +189,9 @@ class Stripe(ApplePayMixin, BaseClientSidePaymentProcessor):
                     # don't create a new intent for the same basket
                     idempotency_key=self.generate_basket_pi_idempotency_key(basket),
                 )
-                logger.info("*** STRIPE RESPONSE %s ***", stripe_response)
                 # id is the payment_intent_id from Stripe
                 transaction_id = stripe_response['id']
+                logger.debug('Created Stripe PaymentIntent [%s] for basket [%d].', transaction_id, basket.id)
 
                 basket_add_payment_intent_id_attribute(basket, transaction_id)
             # for when basket was already created, but with different amount
@@ -137,10 +200,9 @@ class Stripe(ApplePayMixin, BaseClientSidePaymentProcessor):
                 # it from Stripe using the payment_intent_id BasketAttribute.
                 # Note that we update the PI's price in handle_processor_response
                 # before hitting the confirm endpoint, so we don't need to do that here
-                payment_intent_id_attribute = BasketAttributeType.objects.get(name=PAYMENT_INTENT_ID_ATTRIBUTE)
                 payment_intent_attr = BasketAttribute.objects.get(
                     basket=basket,
-                    attribute_type=payment_intent_id_attribute
+                    attribute_type__name=PAYMENT_INTENT_ID_ATTRIBUTE
                 )
                 transaction_id = payment_intent_attr.value_text.strip()
                 logger.info(
@@ -158,6 +220,51 @@ class Stripe(ApplePayMixin, BaseClientSidePaymentProcessor):
         }
         return new_capture_context
 
+    def _recover_payment_intent(self, payment_intent_id, basket, error):
+        """
+        Retrieve a PaymentIntent whose modify or confirm call failed in a way that may hide a successful charge.
+
+        Returns the PaymentIntent if Stripe has charged it for the basket's current total. Raises a
+        PaymentPendingError if Stripe may still charge it, and a GatewayError otherwise.
+        """
+        try:
+            payment_intent = stripe.PaymentIntent.retrieve(payment_intent_id, expand=['payment_method'])
+        except stripe.error.StripeError:
+            logger.exception(
+                'Could not retrieve Stripe payment intent [%s] for basket [%d].',
+                payment_intent_id,
+                basket.id,
+            )
+            payment_intent = None
+
+        status = payment_intent.get('status') if payment_intent is not None else None
+        if status == 'succeeded' and str(payment_intent.get('amount')) == self._get_basket_amount(basket):
+            logger.warning(
+                'Stripe call for payment intent [%s] for basket [%d] failed, but the payment intent succeeded.',
+                payment_intent_id,
+                basket.id,
+            )
+            return payment_intent
+
+        if payment_intent is not None:
+            self.record_processor_response(payment_intent, transaction_id=payment_intent_id, basket=basket)
+
+        if status in (None, 'processing', 'requires_confirmation'):
+            # The charge may still go through, e.g. while a timed-out confirm is being processed by Stripe.
+            msg = 'Stripe payment intent [{}] for basket [{}] is pending, status [{}]. It must be reconciled.'.format(
+                payment_intent_id, basket.id, status)
+            logger.error(msg)
+            raise PaymentPendingError(msg) from error
+
+        if status == 'succeeded':
+            msg = 'Stripe payment intent [{}] for basket [{}] succeeded for amount [{}] instead of [{}].'.format(
+                payment_intent_id, basket.id, payment_intent.get('amount'), self._get_basket_amount(basket))
+        else:
+            msg = 'Stripe payment intent [{}] for basket [{}] was not successful, status [{}].'.format(
+                payment_intent_id, basket.id, status)
+        logger.error(msg)
+        raise GatewayError(msg) from error
+
     def get_transaction_parameters(self, basket, request=None, use_client_side_checkout=True, **kwargs):
         return {'payment_page_url': self.client_side_payment_url}
 
@@ -167,12 +274,12 @@ class Stripe(ApplePayMixin, BaseClientSidePaymentProcessor):
         payment_intent_id = response['payment_intent_id']
         # NOTE: In the future we may want to get/create a Customer. See https://stripe.com/docs/api#customers.
 
-        # rewrite order amount so it's updated for coupon & quantity and unchanged by the user
-        stripe.PaymentIntent.modify(
-            payment_intent_id,
-            **self._build_payment_intent_parameters(basket),
-        )
         try:
+            # rewrite order amount so it's updated for coupon & quantity and unchanged by the user
+            stripe.PaymentIntent.modify(
+                payment_intent_id,
+                **self._build_payment_intent_parameters(basket),
+            )
             confirm_api_response = stripe.PaymentIntent.confirm(
                 payment_intent_id,
                 # stop on complicated payments MFE can't handle yet
@@ -181,14 +288,27 @@ class Stripe(ApplePayMixin, BaseClientSidePaymentProcessor):
             )
         except stripe.error.CardError as err:
             self.record_processor_response(err.json_body, transaction_id=payment_intent_id, basket=basket)
-            logger.exception('Card Error for basket [%d]: %s}', basket.id, err)
+            logger.exception('Card Error for basket [%d]: %s', basket.id, err)
             raise
+        except stripe.error.InvalidRequestError as err:
+            if err.code != 'payment_intent_unexpected_state':
+                raise
+            # An earlier submission may have been charged without its response reaching us.
+            confirm_api_response = self._recover_payment_intent(payment_intent_id, basket, err)
+        except stripe.error.APIConnectionError as err:
+            # Raised when Stripe could not be reached in time, including connect and read timeouts.
+            # The confirm may still have gone through, so go by the payment intent's actual status.
+            confirm_api_response = self._recover_payment_intent(payment_intent_id, basket, err)
 
-        # proceed only if payment went through
-        # pylint: disable=E1136
-        assert confirm_api_response['status'] == "succeeded"
         self.record_processor_response(confirm_api_response, transaction_id=payment_intent_id, basket=basket)
 
+        # proceed only if payment went through
+        if confirm_api_response.get('status') != 'succeeded':
+            msg = 'Stripe payment intent [{}] for basket [{}] was not successful, status [{}].'.format(
+                payment_intent_id, basket.id, confirm_api_response.get('status'))
+            logger.error(msg)
+            raise GatewayError(msg)
+
         logger.info(
             'Successfully confirmed Stripe payment intent [%s] for basket [%d] and order number [%s].',
             payment_intent_id,
@@ -220,9 +340,10 @@ class Stripe(ApplePayMixin, BaseClientSidePaymentProcessor):
             if err.code == 'charge_already_refunded':
                 refund = stripe.Refund.list(payment_intent=reference_number, limit=1)['data'][0]
                 self.record_processor_response(refund, transaction_id=refund.id, basket=basket)
-                msg = 'Skipping issuing credit (via Stripe) for order [{}] because charge was already refunded.'.format(
-                    order_number)
-                logger.warning(msg)
+                logger.warning(
+                    'Skipping issuing credit (via Stripe) for order [%s] because charge was already refunded.',
+                    order_number,
+                )
             else:
                 self.record_processor_response(err.json_body, transaction_id=reference_number, basket=basket)
                 msg = 'An error occurred while attempting to issue a credit (via Stripe) for order [{}].'.format(
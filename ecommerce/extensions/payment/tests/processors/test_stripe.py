@@ -7,6 +7,7 @@ import stripe
 from oscar.apps.payment.exceptions import GatewayError
 from oscar.core.loading import get_model
 
+from ecommerce.extensions.payment.exceptions import PaymentPendingError
 from ecommerce.extensions.payment.processors.stripe import Stripe
 from ecommerce.extensions.payment.tests.processors.mixins import PaymentProcessorTestCaseMixin
 from ecommerce.extensions.test.factories import create_order
@@ -105,6 +106,142 @@ class StripeTests(PaymentProcessorTestCaseMixin, TestCase):
     #             self.basket
     #         )
 
+    def test_http_client_timeout(self):
+        assert isinstance(stripe.default_http_client, stripe.RequestsClient)
+        # pylint: disable=protected-access
+        assert stripe.default_http_client._timeout == (self.processor.connect_timeout, self.processor.read_timeout)
+
+        http_client = stripe.default_http_client
+        self.processor_class(self.site)
+        assert stripe.default_http_client is http_client
+
+    def test_handle_processor_response_connection_error(self):
+        """ Verify a payment intent left pending by a timed-out confirm call is recorded and reported as pending. """
+        payment_intent = {'id': 'pi_testtesttest', 'status': 'processing'}
+        with mock.patch('stripe.PaymentIntent.modify'):
+            with mock.patch('stripe.PaymentIntent.confirm') as confirm_mock:
+                confirm_mock.side_effect = stripe.error.APIConnectionError('Request timed out')
+                with mock.patch('stripe.PaymentIntent.retrieve') as retrieve_mock:
+                    retrieve_mock.return_value = payment_intent
+                    with self.assertRaises(PaymentPendingError):
+                        self.processor.handle_processor_response(
+                            {'payment_intent_id': 'pi_testtesttest'}, self.basket
+                        )
+
+        retrieve_mock.assert_called_once_with('pi_testtesttest', expand=['payment_method'])
+        self.assert_processor_response_recorded(
+            self.processor_name,
+            'pi_testtesttest',
+            payment_intent,
+            basket=self.basket
+        )
+
+    def test_handle_processor_response_connection_error_retrieve_fails(self):
+        with mock.patch('stripe.PaymentIntent.modify'):
+            with mock.patch('stripe.PaymentIntent.confirm') as confirm_mock:
+                confirm_mock.side_effect = stripe.error.APIConnectionError('Request timed out')
+                with mock.patch('stripe.PaymentIntent.retrieve') as retrieve_mock:
+                    retrieve_mock.side_effect = stripe.error.APIConnectionError('Request timed out')
+                    with self.assertRaises(PaymentPendingError):
+                        self.processor.handle_processor_response(
+                            {'payment_intent_id': 'pi_testtesttest'}, self.basket
+                        )
+
+    def test_handle_processor_response_connection_error_failed(self):
+        with mock.patch('stripe.PaymentIntent.modify'):
+            with mock.patch('stripe.PaymentIntent.confirm') as confirm_mock:
+                confirm_mock.side_effect = stripe.error.APIConnectionError('Request timed out')
+                with mock.patch('stripe.PaymentIntent.retrieve') as retrieve_mock:
+                    retrieve_mock.return_value = {'id': 'pi_testtesttest', 'status': 'requires_payment_method'}
+                    with self.assertRaises(GatewayError) as context:
+                        self.processor.handle_processor_response(
+                            {'payment_intent_id': 'pi_testtesttest'}, self.basket
+                        )
+
+        assert not isinstance(context.exception, PaymentPendingError)
+
+    def _succeeded_payment_intent(self):
+        return {
+            'id': 'pi_testtesttest',
+            'status': 'succeeded',
+            'amount': int(self.processor._get_basket_amount(self.basket)),  # pylint: disable=protected-access
+            'charges': {
+                'data': [
+                    {'payment_method_details': {'card': {'brand': 'visa', 'last4': '4242'}}},
+                ],
+            },
+        }
+
+    def test_handle_processor_response_connection_error_succeeded(self):
+        """ Verify a payment that Stripe charged despite a timed-out confirm call is treated as successful. """
+        payment_intent = self._succeeded_payment_intent()
+        with mock.patch('stripe.PaymentIntent.modify'):
+            with mock.patch('stripe.PaymentIntent.confirm') as confirm_mock:
+                confirm_mock.side_effect = stripe.error.APIConnectionError('Request timed out')
+                with mock.patch('stripe.PaymentIntent.retrieve') as retrieve_mock:
+                    retrieve_mock.return_value = payment_intent
+                    actual = self.processor.handle_processor_response(
+                        {'payment_intent_id': 'pi_testtesttest'}, self.basket
+                    )
+
+        assert actual.transaction_id == 'pi_testtesttest'
+        assert actual.card_number == '4242'
+        assert actual.total == self.basket.total_incl_tax
+        self.assert_processor_response_recorded(
+            self.processor_name,
+            'pi_testtesttest',
+            payment_intent,
+            basket=self.basket
+        )
+
+    def test_handle_processor_response_already_succeeded(self):
+        """ Verify a resubmitted payment that an earlier, timed-out submission already charged is reconciled. """
+        payment_intent = self._succeeded_payment_intent()
+        with mock.patch('stripe.PaymentIntent.modify') as modify_mock:
+            modify_mock.side_effect = stripe.error.InvalidRequestError(
+                'This PaymentIntent\'s amount could not be updated because it has a status of succeeded.',
+                'amount',
+                code='payment_intent_unexpected_state',
+            )
+            with mock.patch('stripe.PaymentIntent.confirm') as confirm_mock:
+                with mock.patch('stripe.PaymentIntent.retrieve') as retrieve_mock:
+                    retrieve_mock.return_value = payment_intent
+                    actual = self.processor.handle_processor_response(
+                        {'payment_intent_id': 'pi_testtesttest'}, self.basket
+                    )
+
+        confirm_mock.assert_not_called()
+        assert actual.transaction_id == 'pi_testtesttest'
+        assert actual.card_number == '4242'
+
+    def test_handle_processor_response_already_succeeded_amount_mismatch(self):
+        payment_intent = dict(self._succeeded_payment_intent(), amount=1)
+        with mock.patch('stripe.PaymentIntent.modify') as modify_mock:
+            modify_mock.side_effect = stripe.error.InvalidRequestError(
+                'This PaymentIntent\'s amount could not be updated because it has a status of succeeded.',
+                'amount',
+                code='payment_intent_unexpected_state',
+            )
+            with mock.patch('stripe.PaymentIntent.retrieve') as retrieve_mock:
+                retrieve_mock.return_value = payment_intent
+                with self.assertRaises(GatewayError):
+                    self.processor.handle_processor_response({'payment_intent_id': 'pi_testtesttest'}, self.basket)
+
+    def test_handle_processor_response_not_succeeded(self):
+        confirm_response = {'id': 'pi_testtesttest', 'status': 'requires_payment_method'}
+        with mock.patch('stripe.PaymentIntent.modify'):
+            with mock.patch('stripe.PaymentIntent.confirm') as confirm_mock:
+                confirm_mock.return_value = confirm_response
+                with self.assertRaises(GatewayError):
+                    self.processor.handle_processor_response({'payment_intent_id': 'pi_testtesttest'}, self.basket)
+
+        self.assert_processor_response_recorded(
+            self.processor_name,
+            'pi_testtesttest',
+            confirm_response,
+            basket=self.basket
+        )
+
     def test_issue_credit(self):
         charge_reference_number = '9436'
         refund = stripe.Refund.construct_from({
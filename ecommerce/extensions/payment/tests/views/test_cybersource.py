@@ -24,6 +24,7 @@ from ecommerce.extensions.order.constants import PaymentEventTypeName
 from ecommerce.extensions.payment.core.sdn import SDNClient
 from ecommerce.extensions.payment.processors.cybersource import Cybersource
 from ecommerce.extensions.payment.tests.mixins import CybersourceMixin, CyberSourceRESTAPIMixin
+from ecommerce.extensions.payment.views.cybersource import ApplePayStartSessionView
 from ecommerce.extensions.test.factories import create_basket
 from ecommerce.tests.testcases import TestCase
 
@@ -532,6 +533,15 @@ class ApplePayStartSessionViewTests(LoginMixin, TestCase):
             request_from_mfe and enable_microfrontend,
         )
 
+    def test_post_timeout(self):
+        """ The view should bound the request to Apple with its own timeout. """
+        with mock.patch('ecommerce.extensions.payment.views.cybersource.requests.post') as mock_post:
+            mock_post.return_value.status_code = 200
+            mock_post.return_value.json.return_value = {'foo': 'bar'}
+            self.client.post(self.url, json.dumps({'url': 'https://apple-pay-gateway.apple.com'}), JSON)
+
+        self.assertEqual(mock_post.call_args.kwargs['timeout'], ApplePayStartSessionView.START_SESSION_TIMEOUT)
+
     def test_post_without_url(self):
         """ The view should return HTTP 400 if no url parameter is posted. """
         response = self.client.post(self.url)
@@ -3,18 +3,24 @@ import json
 import stripe
 from ddt import ddt, file_data
 from django.conf import settings
+from django.core.cache import cache
+from django.test import RequestFactory
 from django.urls import reverse
 from mock import mock
 from oscar.core.loading import get_class, get_model
 from rest_framework import status
 
 from ecommerce.core.constants import SEAT_PRODUCT_CLASS_NAME
+from ecommerce.core.utils import get_cache_key
 from ecommerce.courses.tests.factories import CourseFactory
+from ecommerce.extensions.basket.constants import PAYMENT_INTENT_ID_ATTRIBUTE
+from ecommerce.extensions.basket.utils import basket_add_payment_intent_id_attribute
 from ecommerce.extensions.checkout.utils import get_receipt_page_url
 from ecommerce.extensions.order.constants import PaymentEventTypeName
 from ecommerce.extensions.payment.constants import STRIPE_CARD_TYPE_MAP
 from ecommerce.extensions.payment.processors.stripe import Stripe
 from ecommerce.extensions.payment.tests.mixins import PaymentEventsMixin
+from ecommerce.extensions.payment.views.stripe import StripeCheckoutView
 from ecommerce.extensions.test.factories import create_basket
 from ecommerce.tests.testcases import TestCase
 
@@ -261,9 +267,102 @@ class StripeCheckoutViewTests(PaymentEventsMixin, TestCase):
                     'client_secret': 'pi_3LsftNIadiFyUl1x2TWxaADZ_secret_VxRx7Y1skyp0jKtq7Gdu80Xnh',
                 }
                 self.client.get(self.capture_context_url)
+                mock_create.assert_not_called()
                 mock_retrieve.assert_called_once()
                 assert mock_retrieve.call_args.kwargs['id'] == 'pi_3LsftNIadiFyUl1x2TWxaADZ'
 
+    def test_capture_context_reuses_payment_intent(self):
+        """
+        Verify that calling capture context again for the same basket retrieves the
+        existing payment intent instead of creating a new one.
+        """
+        basket = self.create_basket(product_class=SEAT_PRODUCT_CLASS_NAME)
+        payment_intent = {
+            'id': 'pi_3LsftNIadiFyUl1x2TWxaADZ',
+            'client_secret': 'pi_3LsftNIadiFyUl1x2TWxaADZ_secret_VxRx7Y1skyp0jKtq7Gdu80Xnh',
+            'status': 'requires_payment_method',
+        }
+
+        with mock.patch('stripe.PaymentIntent.create') as mock_create:
+            mock_create.return_value = payment_intent
+            self.client.get(self.capture_context_url)
+            mock_create.assert_called_once()
+
+        with mock.patch('stripe.PaymentIntent.create') as mock_create:
+            with mock.patch('stripe.PaymentIntent.retrieve') as mock_retrieve:
+                mock_retrieve.return_value = payment_intent
+                response = self.client.get(self.capture_context_url)
+                mock_create.assert_not_called()
+                mock_retrieve.assert_called_once()
+
+        assert response.json()['capture_context'] == {
+            'key_id': payment_intent['client_secret'],
+            'order_id': basket.order_number,
+        }
+
+    def test_capture_context_canceled_payment_intent(self):
+        """
+        Verify that a canceled payment intent stored on the basket is not reused, and that
+        the basket is updated with the newly created payment intent.
+        """
+        basket = self.create_basket(product_class=SEAT_PRODUCT_CLASS_NAME)
+        payment_intent = {
+            'id': 'pi_3LsftNIadiFyUl1x2TWxaADZ',
+            'client_secret': 'pi_3LsftNIadiFyUl1x2TWxaADZ_secret_VxRx7Y1skyp0jKtq7Gdu80Xnh',
+        }
+        new_payment_intent = {
+            'id': 'pi_3LsftNIadiFyUl1x2TWxaADY',
+            'client_secret': 'pi_3LsftNIadiFyUl1x2TWxaADY_secret_VxRx7Y1skyp0jKtq7Gdu80Xnh',
+        }
+
+        with mock.patch('stripe.PaymentIntent.create') as mock_create:
+            mock_create.return_value = payment_intent
+            self.client.get(self.capture_context_url)
+
+        with mock.patch('stripe.PaymentIntent.create') as mock_create:
+            mock_create.return_value = new_payment_intent
+            with mock.patch('stripe.PaymentIntent.retrieve') as mock_retrieve:
+                mock_retrieve.return_value = dict(payment_intent, status='canceled')
+                response = self.client.get(self.capture_context_url)
+                mock_create.assert_called_once()
+
+        assert response.json()['capture_context']['key_id'] == new_payment_intent['client_secret']
+        assert BasketAttribute.objects.get(
+            basket=basket,
+            attribute_type__name=PAYMENT_INTENT_ID_ATTRIBUTE,
+        ).value_text == new_payment_intent['id']
+
+    def test_capture_context_idempotency_error(self):
+        """
+        Verify that if the existing payment intent can't be retrieved up front and creating one
+        fails with an IdempotencyError, the existing payment intent is retrieved again.
+        """
+        basket = self.create_basket(product_class=SEAT_PRODUCT_CLASS_NAME)
+        payment_intent = {
+            'id': 'pi_3LsftNIadiFyUl1x2TWxaADZ',
+            'client_secret': 'pi_3LsftNIadiFyUl1x2TWxaADZ_secret_VxRx7Y1skyp0jKtq7Gdu80Xnh',
+        }
+
+        with mock.patch('stripe.PaymentIntent.create') as mock_create:
+            mock_create.return_value = payment_intent
+            self.client.get(self.capture_context_url)
+
+        with mock.patch('stripe.PaymentIntent.create') as mock_create:
+            mock_create.side_effect = stripe.error.IdempotencyError
+            with mock.patch('stripe.PaymentIntent.retrieve') as mock_retrieve:
+                mock_retrieve.side_effect = [
+                    stripe.error.APIConnectionError('Request timed out'),
+                    payment_intent,
+                ]
+                response = self.client.get(self.capture_context_url)
+                mock_create.assert_called_once()
+                assert mock_retrieve.call_count == 2
+
+        assert response.json()['capture_context'] == {
+            'key_id': payment_intent['client_secret'],
+            'order_id': basket.order_number,
+        }
+
     def test_capture_context_empty_basket(self):
         basket = create_basket(owner=self.user, site=self.site)
         basket.flush()
@@ -343,6 +442,85 @@ class StripeCheckoutViewTests(PaymentEventsMixin, TestCase):
             )
             assert response.status_code == 400
             assert response.json() == {'sdn_check_failure': {'hit_count': 1}}
+            assert mock_sdn_check.call_args.kwargs['basket'] == basket
+
+    def test_get_basket_single_query(self):
+        """
+        Verify the basket for a payment intent is looked up, with its owner and site configuration,
+        in a single query.
+        """
+        basket = self.create_basket(product_class=SEAT_PRODUCT_CLASS_NAME)
+        basket_add_payment_intent_id_attribute(basket, 'pi_3LsftNIadiFyUl1x2TWxaADZ')
+
+        view = StripeCheckoutView()
+        view.request = RequestFactory().post(self.stripe_checkout_url)
+        view.request.site = self.site
+        view.payment_processor  # pylint: disable=pointless-statement
+
+        with mock.patch('ecommerce.extensions.payment.views.stripe.Applicator'):
+            with mock.patch('ecommerce.extensions.payment.views.stripe.basket_add_organization_attribute'):
+                with self.assertNumQueries(1):
+                    actual = view._get_basket('pi_3LsftNIadiFyUl1x2TWxaADZ')  # pylint: disable=protected-access
+
+        with self.assertNumQueries(0):
+            assert actual.owner == self.user
+            assert actual.site.siteconfiguration == self.site.siteconfiguration
+        assert actual == basket
+
+    def test_payment_already_in_progress(self):
+        """
+        Verify a submission for a payment intent that is already being processed is rejected
+        without calling Stripe.
+        """
+        payment_intent_id = 'pi_3LsftNIadiFyUl1x2TWxaADZ'
+        lock_key = get_cache_key(resource_name='stripe_checkout_lock', payment_intent_id=payment_intent_id)
+        cache.add(lock_key, True)
+
+        with mock.patch('stripe.PaymentIntent.retrieve') as mock_retrieve:
+            response = self.client.post(
+                self.stripe_checkout_url,
+                data={'payment_intent_id': payment_intent_id, 'skus': ''},
+            )
+            mock_retrieve.assert_not_called()
+
+        assert response.status_code == 400
+        assert response.json() == {}
+
+        cache.delete(lock_key)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.client.post(
+                self.stripe_checkout_url,
+                data={'payment_intent_id': payment_intent_id, 'skus': ''},
+            )
+            # The lock is held until the request's transaction commits.
+            assert cache.get(lock_key)
+        # The lock was free, so the request is processed (and fails for lack of a basket).
+        assert response.status_code == 302
+        assert len(callbacks) == 1
+        assert cache.get(lock_key) is None
+
+    def test_payment_malformed_payment_intent_id(self):
+        """
+        Verify a payment intent id that isn't a valid cache key on its own is handled like an unknown one.
+        """
+        payment_intent_id = 'pi_{}'.format(' \n' * 200)
+        with mock.patch('ecommerce.extensions.payment.views.stripe.cache', wraps=cache) as mock_cache:
+            response = self.client.post(self.stripe_checkout_url, data={'payment_intent_id': payment_intent_id})
+
+        lock_key = mock_cache.add.call_args.args[0]
+        assert len(lock_key) <= 250
+        assert not any(char.isspace() for char in lock_key)
+        assert response.status_code == 302
+
+    def test_payment_without_payment_intent_id(self):
+        """
+        Verify a submission without a payment intent id is rejected without taking a lock.
+        """
+        with mock.patch('ecommerce.extensions.payment.views.stripe.cache') as mock_cache:
+            response = self.client.post(self.stripe_checkout_url, data={'skus': ''})
+            mock_cache.add.assert_not_called()
+
+        assert response.status_code == 302
 
     def test_handle_payment_fails_with_carderror(self):
         """
@@ -380,6 +558,35 @@ class StripeCheckoutViewTests(PaymentEventsMixin, TestCase):
             assert response.status_code == 400
             assert response.json() == {}
 
+    def test_handle_payment_pending(self):
+        """
+        Verify a payment left pending by a timed-out confirm call returns an error and keeps
+        the recorded payment intent for reconciliation.
+        """
+        basket = self.create_basket(product_class=SEAT_PRODUCT_CLASS_NAME)
+        with open(STRIPE_TEST_FIXTURE_PATH, 'r') as fixtures:  # pylint: disable=unspecified-encoding
+            retrieve_addr_resp = json.load(fixtures)['happy_path']['retrieve_addr_resp']
+        pending_resp = {'id': 'pi_3LsftNIadiFyUl1x2TWxaADZ', 'status': 'processing'}
+
+        response = self.payment_flow_with_mocked_stripe_calls(
+            self.stripe_checkout_url,
+            {
+                'payment_intent_id': 'pi_3LsftNIadiFyUl1x2TWxaADZ',
+                'skus': basket.lines.first().stockrecord.partner_sku,
+            },
+            retrieve_side_effect=[retrieve_addr_resp, pending_resp],
+            confirm_side_effect=stripe.error.APIConnectionError('Request timed out'),
+        )
+
+        assert response.status_code == 400
+        assert response.json() == {}
+        self.assert_processor_response_recorded(
+            Stripe.NAME,
+            'pi_3LsftNIadiFyUl1x2TWxaADZ',
+            pending_resp,
+            basket=basket
+        )
+
     def test_create_billing_address_fails(self):
         """
         Verify order is not successful if billing address objects fails
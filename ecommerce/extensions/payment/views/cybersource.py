@@ -482,6 +482,10 @@ class CybersourceAuthorizeAPIView(
 class ApplePayStartSessionView(CyberSourceProcessorMixin, APIView):
     permission_classes = (permissions.IsAuthenticated,)
 
+    # (connect, read) timeout, in seconds, for the merchant session request. Apple's gateway is reached over
+    # the public internet, so it gets more room than the Cybersource API timeouts allow.
+    START_SESSION_TIMEOUT = (3.05, 10)
+
     def post(self, request):
         url = request.data.get('url')
         if not url:
@@ -506,7 +510,12 @@ class ApplePayStartSessionView(CyberSourceProcessorMixin, APIView):
             'displayName': request.site.name,
         }
 
-        response = requests.post(url, json=data, cert=self.payment_processor.apple_pay_merchant_id_certificate_path)
+        response = requests.post(
+            url,
+            json=data,
+            cert=self.payment_processor.apple_pay_merchant_id_certificate_path,
+            timeout=self.START_SESSION_TIMEOUT
+        )
 
         if response.status_code > 299:
             logger.warning('Failed to start Apple Pay session. [%s] returned status [%d] with content %s',
@@ -2,21 +2,25 @@
 
 import logging
 
+from django.core.cache import cache
 from django.core.exceptions import MultipleObjectsReturned, ObjectDoesNotExist
 from django.db import transaction
 from django.http import JsonResponse
 from django.shortcuts import redirect
+from django.utils.functional import cached_property
 from oscar.apps.partner import strategy
 from oscar.core.loading import get_class, get_model
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from stripe.error import CardError
 
+from ecommerce.core.utils import get_cache_key
 from ecommerce.extensions.basket.constants import PAYMENT_INTENT_ID_ATTRIBUTE
 from ecommerce.extensions.basket.utils import basket_add_organization_attribute, basket_add_payment_intent_id_attribute
 from ecommerce.extensions.checkout.mixins import EdxOrderPlacementMixin
 from ecommerce.extensions.checkout.utils import get_receipt_page_url
 from ecommerce.extensions.payment.core.sdn import checkSDN
+from ecommerce.extensions.payment.exceptions import PaymentPendingError
 from ecommerce.extensions.payment.forms import StripeSubmitForm
 from ecommerce.extensions.payment.processors.stripe import Stripe
 from ecommerce.extensions.payment.views import BasePaymentSubmitView
@@ -25,7 +29,6 @@ logger = logging.getLogger(__name__)
 
 Applicator = get_class('offer.applicator', 'Applicator')
 BasketAttribute = get_model('basket', 'BasketAttribute')
-BasketAttributeType = get_model('basket', 'BasketAttributeType')
 BillingAddress = get_model('order', 'BillingAddress')
 Country = get_model('address', 'Country')
 NoShippingRequired = get_class('shipping.methods', 'NoShippingRequired')
@@ -41,7 +44,7 @@ class StripeSubmitView(EdxOrderPlacementMixin, BasePaymentSubmitView):
     """
     form_class = StripeSubmitForm
 
-    @property
+    @cached_property
     def payment_processor(self):
         return Stripe(self.request.site)
 
@@ -84,11 +87,16 @@ class StripeCheckoutView(EdxOrderPlacementMixin, APIView):
     # making Stripe checkout submit requests.
     permission_classes = [IsAuthenticated]
 
-    @property
+    # Upper bound, in seconds, on how long a submission holds its payment intent lock. The lock is
+    # released once the request's transaction commits; it is left to expire if the request fails.
+    # It outlasts the Stripe read timeouts of the modify, confirm and recovery retrieve calls.
+    PAYMENT_INTENT_LOCK_TIMEOUT = 300
+
+    @cached_property
     def payment_processor(self):
         return Stripe(self.request.site)
 
-    def check_sdn(self, request, data):
+    def check_sdn(self, request, data, basket):
         """
         Check that the supplied request and form data passes SDN checks.
 
@@ -99,19 +107,20 @@ class StripeCheckoutView(EdxOrderPlacementMixin, APIView):
             request,
             data['name'],
             data['city'],
-            data['country'])
+            data['country'],
+            basket=basket)
 
         if hit_count > 0:
             logger.info(
                 'SDNCheck function called for basket [%d]. It received %d hit(s).',
-                request.basket.id,
+                basket.id,
                 hit_count,
             )
             return hit_count
 
         logger.info(
             'SDNCheck function called for basket [%d]. It did not receive a hit.',
-            request.basket.id,
+            basket.id,
         )
         return None
 
@@ -127,11 +136,14 @@ class StripeCheckoutView(EdxOrderPlacementMixin, APIView):
             duplicate payment_intent_id* received or any other exception occurred.
         """
         try:
-            payment_intent_id_attribute, __ = BasketAttributeType.objects.get_or_create(
-                name=PAYMENT_INTENT_ID_ATTRIBUTE
-            )
-            basket_attribute = BasketAttribute.objects.get(
-                attribute_type=payment_intent_id_attribute,
+            # Filter on the attribute type's name rather than fetching the (static) type row first,
+            # and pull in the basket's owner and site configuration, which applying offers, payment
+            # handling and the receipt response all read, so everything comes back in a single query.
+            basket_attribute = BasketAttribute.objects.select_related(
+                'basket__owner',
+                'basket__site__siteconfiguration',
+            ).get(
+                attribute_type__name=PAYMENT_INTENT_ID_ATTRIBUTE,
                 value_text=payment_intent_id,
             )
             basket = basket_attribute.basket
@@ -158,6 +170,32 @@ class StripeCheckoutView(EdxOrderPlacementMixin, APIView):
         """
         Handle an incoming payment submission from the payment MFE after capture-context.
         SDN Check and confirmation by Stripe on the payment intent is performed.
+
+        Only one submission per payment intent is processed at a time; concurrent duplicates
+        (e.g. a double click) are rejected without calling Stripe.
+        """
+        payment_intent_id = request.POST.get('payment_intent_id')
+        if not payment_intent_id:
+            logger.warning('Received Stripe payment submission without a payment intent id.')
+            return redirect(self.payment_processor.error_url)
+
+        # The id comes straight from the request, so it is hashed into a key that is valid for any cache backend.
+        lock_key = get_cache_key(resource_name='stripe_checkout_lock', payment_intent_id=payment_intent_id)
+        if not cache.add(lock_key, True, self.PAYMENT_INTENT_LOCK_TIMEOUT):
+            logger.warning(
+                'Stripe payment for payment intent id [%s] is already being processed. Rejecting duplicate request.',
+                payment_intent_id,
+            )
+            return self.error_page_response()
+
+        response = self.process_payment(request)
+        # With ATOMIC_REQUESTS the order is only committed after the view returns, so hold the lock until then.
+        transaction.on_commit(lambda: cache.delete(lock_key))
+        return response
+
+    def process_payment(self, request):
+        """
+        Process a payment submission once the payment intent lock is held.
         """
         stripe_response = request.POST.dict()
         payment_intent_id = stripe_response.get('payment_intent_id')
@@ -198,10 +236,10 @@ class StripeCheckoutView(EdxOrderPlacementMixin, APIView):
         request_skus = stripe_response.get('skus')
         if request_skus:
             request_skus = set(request_skus.split(','))
-            basket_skus = set(basket.lines.values_list(
-                'stockrecord__partner_sku',
-                flat=True
-            ))
+            # The lines were already loaded, with their stock records, when offers were applied.
+            basket_skus = {
+                line.stockrecord.partner_sku if line.stockrecord else None for line in basket.all_lines()
+            }
             if request_skus != basket_skus:
                 logger.warning(
                     'Basket [%d] SKU mismatch! request_skus [%s] and basket_skus [%s].',
@@ -221,7 +259,7 @@ class StripeCheckoutView(EdxOrderPlacementMixin, APIView):
             'city': billing_address_obj.city,
             'country': billing_address_obj.country_id,
         }
-        sdn_check_failure = self.check_sdn(self.request, sdn_check_data)
+        sdn_check_failure = self.check_sdn(self.request, sdn_check_data, basket)
         if sdn_check_failure is not None:
             return self.sdn_error_page_response(sdn_check_failure)
 
@@ -231,6 +269,9 @@ class StripeCheckoutView(EdxOrderPlacementMixin, APIView):
                     self.handle_payment(stripe_response, basket)
                 except CardError as err:
                     return self.stripe_error_response(err)
+                except PaymentPendingError:
+                    # Returning from the block keeps the recorded processor response for reconciliation.
+                    return self.error_page_response()
         except:  # pylint: disable=bare-except
             logger.exception('Attempts to handle payment for basket [%d] failed.', basket.id)
             return self.error_page_response()